@@ -1,44 +1,133 @@
 from typing import Optional
-from passlib.context import CryptContext
+from cachetools import TTLCache
+from sqlalchemy import exists, select
 from sqlalchemy.orm import Session
-from db import User
+from db import Profile, User, new_auth_salt, user_email_matches
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
 import uuid
 
-# Use PBKDF2 to avoid bcrypt's 72-byte password limit and backend issues
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Use PBKDF2 to avoid bcrypt's 72-byte password limit and backend issues.
+# Hashes are computed with OpenSSL's hashlib.pbkdf2_hmac in passlib's modular
+# crypt format ($pbkdf2-sha256$rounds$salt$hash), so hashes created by earlier
+# passlib-based versions still verify.
+PBKDF2_PREFIX = "$pbkdf2-sha256$"
+# Iteration count for new hashes; stored hashes with a different count are
+# rewritten on the next successful login
+PBKDF2_ROUNDS = int(os.getenv("PBKDF2_ROUNDS", "120000"))
+PBKDF2_SALT_BYTES = 16
+
+# OAuth-created users sign in via their provider, so they get a random
+# non-hash marker instead of a (slow, never-verified) password hash
+OAUTH_PASSWORD_PREFIX = "!oauth:"
+
+# Recently verified credentials: user id -> fast salted digest.
+# A hit skips the (deliberately slow) PBKDF2 verification for repeat logins.
+_verified_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+# Recently rejected credentials: (user id, fast digest). Only kept for a few seconds,
+# so a double-submitted wrong password isn't PBKDF2-verified twice.
+_rejected_cache: TTLCache = TTLCache(maxsize=10_000, ttl=3)
+
+# Signed login cookie: lets reloads/new tabs restore the session without logging in again.
+# Disabled unless AUTH_COOKIE_SECRET is set.
+AUTH_COOKIE_NAME = "cbb_auth"
+AUTH_COOKIE_MAX_AGE = int(os.getenv("AUTH_COOKIE_MAX_AGE", str(7 * 24 * 3600)))
+
+# Past this many numbered collisions, new OAuth usernames get a random suffix instead
+USERNAME_SUFFIX_LIMIT = 100
+
+
+def _ab64_encode(data: bytes) -> str:
+    # passlib's "adapted base64": no padding, '.' instead of '+'
+    return base64.b64encode(data).decode("ascii").rstrip("=").replace("+", ".")
+
+
+def _ab64_decode(data: str) -> bytes:
+    data = data.replace(".", "+")
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _pbkdf2_sha256(password: str, salt: bytes, rounds: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, rounds, dklen=32)
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    salt = os.urandom(PBKDF2_SALT_BYTES)
+    dk = _pbkdf2_sha256(password, salt, PBKDF2_ROUNDS)
+    return f"{PBKDF2_PREFIX}{PBKDF2_ROUNDS}${_ab64_encode(salt)}${_ab64_encode(dk)}"
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    if not (hashed_password or "").startswith(PBKDF2_PREFIX):
+        return False
+    try:
+        rounds, salt, checksum = hashed_password[len(PBKDF2_PREFIX):].split("$")
+        expected = _ab64_decode(checksum)
+        dk = _pbkdf2_sha256(plain_password, _ab64_decode(salt), int(rounds))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(dk, expected)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different iteration count than PBKDF2_ROUNDS."""
+    return not hashed_password.startswith(f"{PBKDF2_PREFIX}{PBKDF2_ROUNDS}$")
+
+
+def _fast_digest(user: User, password: str) -> str:
+    # Bound to the stored hash so a password change invalidates cached entries
+    data = f"{user.auth_salt}:{user.password_hash}:{password}".encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
 
 
 def create_user(db: Session, email: str, password: str) -> User:
-    email = (email or "").strip().lower()
-    if not email or not password:
+    user = User(email=email)  # normalized by User's email validator
+    if not user.email or not password:
         raise ValueError("Email and password are required")
     # Enforce unique email
-    existing = db.query(User).filter(User.email == email).first()
-    if existing:
+    if db.scalar(select(exists().where(user_email_matches(email)))):
         raise ValueError("An account with this email already exists")
     # Derive a username for internal use (local-part)
-    username = email.split("@")[0] if "@" in email else email
-    user = User(username=username, email=email, password_hash=hash_password(password))
+    user.username = user.email.split("@")[0] if "@" in user.email else user.email
+    user.password_hash = hash_password(password)
     db.add(user)
     db.commit()
-    db.refresh(user)
     return user
 
 
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = db.query(User).filter(User.email == (email or "").strip().lower()).first()
+    user = db.query(User).filter(user_email_matches(email)).first()
     if not user:
         return None
-    if not verify_password(password or "", user.password_hash):
+    if user.password_hash.startswith(OAUTH_PASSWORD_PREFIX):
         return None
+    password = password or ""
+    digest = _fast_digest(user, password) if user.auth_salt else None
+    if digest:
+        cached = _verified_cache.get(user.id)
+        if cached and hmac.compare_digest(cached, digest):
+            return user
+        if (user.id, digest) in _rejected_cache:
+            return None
+    if not verify_password(password, user.password_hash):
+        if digest:
+            _rejected_cache[(user.id, digest)] = True
+        return None
+    needs_rehash = password_needs_rehash(user.password_hash)
+    if needs_rehash or not user.auth_salt:
+        if needs_rehash:
+            user.password_hash = hash_password(password)
+        if not user.auth_salt:
+            # Accounts created before auth_salt existed get one on first login
+            user.auth_salt = new_auth_salt()
+        db.add(user)
+        db.commit()
+    _verified_cache[user.id] = _fast_digest(user, password)
     return user
 
 
@@ -54,7 +143,8 @@ def upsert_user_oauth(
 
     - If a user exists with provider+provider_id, return it.
     - Else if a user exists with the same email, attach provider info to that user.
-    - Else create a new user with derived username and a random password hash.
+    - Else create a new user with derived username and no usable password,
+      together with its profile in the same transaction.
     """
     # 1) Match by provider id
     u = db.query(User).filter(User.provider == provider, User.provider_id == provider_id).first()
@@ -63,33 +153,89 @@ def upsert_user_oauth(
 
     # 2) Match by email if provided
     if email:
-        u = db.query(User).filter(User.email == email.lower()).first()
+        u = db.query(User).filter(user_email_matches(email)).first()
         if u:
             u.provider = provider
             u.provider_id = provider_id
             db.add(u)
             db.commit()
-            db.refresh(u)
             return u
 
     # 3) Create new user
-    email_norm = (email or "").strip().lower() or None
-    username_base = (email_norm.split("@")[0] if email_norm and "@" in email_norm else (name or "user")).strip()
-    # Ensure unique username by appending suffix if needed
-    candidate = username_base or "user"
-    i = 1
-    while db.query(User).filter(User.username == candidate).first() is not None:
-        i += 1
-        candidate = f"{username_base}{i}"
-
     user = User(
-        username=candidate,
-        email=email_norm,
-        password_hash=hash_password(uuid.uuid4().hex),
+        email=email,
+        password_hash=OAUTH_PASSWORD_PREFIX + secrets.token_urlsafe(16),
         provider=provider,
         provider_id=provider_id,
     )
+    username_base = (user.email.split("@")[0] if user.email and "@" in user.email else (name or "user")).strip()
+    # Ensure unique username by appending suffix if needed: fetch all names sharing
+    # the base in one query, then pick the first free suffix locally
+    username_base = username_base or "user"
+    pattern = username_base.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    taken = {row.username for row in db.query(User.username).filter(User.username.like(pattern, escape="\\")).all()}
+    candidate = username_base
+    i = 1
+    while candidate in taken:
+        i += 1
+        if i > USERNAME_SUFFIX_LIMIT:
+            candidate = f"{username_base}{uuid.uuid4().hex[:8]}"
+            break
+        candidate = f"{username_base}{i}"
+
+    user.username = candidate
+    # Both rows go out in one flush/commit instead of a second commit from get_or_create_profile
+    user.profile = Profile(name=(name or "").strip())
     db.add(user)
     db.commit()
-    db.refresh(user)
+    return user
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _auth_cookie_signature(payload: str, secret: str) -> str:
+    return _b64url(hmac.new(secret.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def make_auth_token(user: User) -> Optional[str]:
+    """Signed, expiring token identifying `user` for the login cookie, or None if cookies are disabled."""
+    secret = os.getenv("AUTH_COOKIE_SECRET")
+    if not secret:
+        return None
+    claims = {"uid": user.id, "email": user.email, "exp": int(time.time()) + AUTH_COOKIE_MAX_AGE}
+    payload = _b64url(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_auth_cookie_signature(payload, secret)}"
+
+
+def read_auth_token(token: Optional[str]) -> Optional[dict]:
+    """Return the token's claims ({"uid", "email", "exp"}) if its signature is valid and it hasn't expired."""
+    secret = os.getenv("AUTH_COOKIE_SECRET")
+    if not secret or not token or "." not in token:
+        return None
+    payload, signature = token.rsplit(".", 1)
+    if not hmac.compare_digest(signature, _auth_cookie_signature(payload, secret)):
+        return None
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or claims.get("exp", 0) < time.time():
+        return None
+    return claims
+
+
+def user_from_auth_token(db: Session, token: Optional[str]) -> Optional[User]:
+    """The user a valid login token was issued to, or None.
+
+    The row must still exist with the token's email: user ids can be reused after a DB reset or
+    when the newest account is removed, so the id alone could point at someone else's account.
+    """
+    claims = read_auth_token(token)
+    if not claims or not isinstance(claims.get("uid"), int):
+        return None
+    user = db.get(User, claims["uid"])
+    if user is None or user.email != claims.get("email"):
+        return None
     return user
@@ -1,26 +1,31 @@
 import os
-from typing import List, Optional
+import re
+import asyncio
+import json
+import time
+import hashlib
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional
 from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.exceptions import OutputParserException
+from langchain_core.rate_limiters import InMemoryRateLimiter
 from dotenv import load_dotenv
 from models import UserProfile, Preferences, ExtractedJob
-from utils import coerce_skills
+from utils import coerce_skills, truncate_to_tokens
 
 load_dotenv()
 
-class Chain:
-    def __init__(self):
-        self.llm = ChatGroq(
-            temperature=0.3,
-            groq_api_key=os.getenv("GROQ_API_KEY"),
-            model_name=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
-        )
+# Jobs per cover-letter call; small batches keep quality stable while sharing the profile prompt
+MAX_JOBS_PER_BATCH = 6
+_LETTER_RE = re.compile(r"<<<LETTER (\d+)>>>\s*(.*?)\s*<<<END \1>>>", re.DOTALL)
+# Bump when the letter prompt changes so previously stored letters are not reused
+LETTER_PROMPT_VERSION = "1"
+# Bump when the extraction prompt changes so cached extractions are not reused
+EXTRACT_PROMPT_VERSION = "1"
 
-    def extract_jobs(self, cleaned_text):
-        prompt_extract = PromptTemplate.from_template(
-            """
+EXTRACT_TEMPLATE = """
             ### SCRAPED TEXT FROM WEBSITE:
             {page_data}
             ### INSTRUCTION:
@@ -29,35 +34,8 @@ class Chain:
             Only return the valid JSON.
             ### VALID JSON (NO PREAMBLE):
             """
-        )
-        chain_extract = prompt_extract | self.llm
-        res = chain_extract.invoke(input={"page_data": cleaned_text})
-        try:
-            json_parser = JsonOutputParser()
-            res = json_parser.parse(res.content)
-        except OutputParserException:
-            raise OutputParserException("Context too big. Unable to parse jobs.")
-        return res if isinstance(res, list) else [res]
 
-    def generate_cover_letter(
-        self,
-        job: ExtractedJob | dict,
-        profile: UserProfile,
-        preferences: Preferences,
-        links: Optional[List[str]] = None,
-    ) -> str:
-        """Generate a personalized cover letter based on job, profile, and preferences."""
-        # Ensure we can handle dicts from parser gracefully
-        if isinstance(job, dict):
-            job = ExtractedJob(**{
-                "role": job.get("role"),
-                "experience": job.get("experience"),
-                "skills": coerce_skills(job.get("skills", [])),
-                "description": job.get("description"),
-            })
-
-        prompt_email = PromptTemplate.from_template(
-            """
+LETTER_TEMPLATE = """
             You are an expert technical career writer.
 
             ### Candidate Profile
@@ -66,55 +44,311 @@ class Chain:
             - Email: {email}
             - Phone: {phone}
             - Key skills: {skills}
-            - Links: {links}
             - Resume highlights:
             {resume_text}
 
-            ### Job Posting
-            - Role: {job_role}
-            - Experience: {job_experience}
-            - Required/Preferred skills: {job_skills}
-            - Description:
-            {job_description}
-
             ### Preferences
             - Tone: {tone}
             - Style: {style}
             - Length: {length}
             - Template hint: {template}
 
-            Write a tailored cover letter addressed to the hiring manager. Requirements:
-            - Start with a strong introduction specific to the role "{job_role}"
-            - Align the candidate's experience and skills to the job.
-            - Reference 1-3 relevant links if applicable.
+            ### Job Postings
+            {jobs}
+
+            Write one tailored cover letter for EACH of the {count} job postings above, addressed to the hiring manager.
+            Requirements for every letter:
+            - Start with a strong introduction specific to that job's role.
+            - Align the candidate's experience and skills to that job.
+            - Reference 1-3 of that job's relevant links if applicable.
             - Keep it {length} in length, with {tone} tone and {style} style.
             - End with a concise, confident closing and a call to action.
 
-            Output only the final cover letter. No headings, no JSON, no extra commentary.
+            Wrap each letter in delimiters using its job number, e.g. for job 1:
+            <<<LETTER 1>>>
+            (cover letter text)
+            <<<END 1>>>
+
+            Output only the delimited cover letters. No headings, no JSON, no extra commentary.
             """
+
+# Per-field prompt budgets (tokens); per batch: ~1500 shared + ~2100 per job
+RESUME_TOKEN_BUDGET = 1200
+PROFILE_SKILLS_TOKEN_BUDGET = 200
+JOB_DESCRIPTION_TOKEN_BUDGET = 1800
+JOB_SKILLS_TOKEN_BUDGET = 200
+
+# Max Groq requests in flight for batched calls; keep at or below the account's rate limit
+MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+# Optional client-side throttle (requests/second), e.g. 0.5 for a 30 RPM plan
+GROQ_REQUESTS_PER_SECOND = os.getenv("GROQ_REQUESTS_PER_SECOND")
+
+
+class Chain:
+    def __init__(self):
+        rate_limiter = None
+        if GROQ_REQUESTS_PER_SECOND:
+            rate_limiter = InMemoryRateLimiter(
+                requests_per_second=float(GROQ_REQUESTS_PER_SECOND),
+                max_bucket_size=MAX_CONCURRENCY,
+            )
+        self.llm = ChatGroq(
+            temperature=0.3,
+            groq_api_key=os.getenv("GROQ_API_KEY"),
+            model_name=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
+            rate_limiter=rate_limiter,
         )
+        # Templates are static: parse them and compose the runnables once
+        self._extract_chain = PromptTemplate.from_template(EXTRACT_TEMPLATE) | self.llm
+        self._letter_chain = PromptTemplate.from_template(LETTER_TEMPLATE) | self.llm
+
+    def _batch_invoke(self, chain, inputs: List[dict], batch_size: Optional[int] = None, delay_between_batches: float = 0.0):
+        """Run `chain` over `inputs` concurrently (up to MAX_CONCURRENCY in flight), preserving order.
 
-        chain_email = prompt_email | self.llm
-        res = chain_email.invoke(
-            {
-                "name": profile.name,
-                "education": profile.education or "",
-                "email": profile.email or "",
-                "phone": profile.phone or "",
-                "skills": ", ".join(profile.skills[:20]),
-                "links": ", ".join((links or profile.links)[:5]),
-                "resume_text": (profile.resume_text or "").strip()[:4000],
-                "job_role": job.role or "",
-                "job_experience": job.experience or "",
-                "job_skills": ", ".join(job.skills[:20]) if job.skills else "",
-                "job_description": (job.description or "")[:6000],
-                "tone": preferences.tone,
-                "style": preferences.style,
-                "length": preferences.length,
-                "template": preferences.template or "",
-            }
+        `batch_size` splits the inputs into waves separated by `delay_between_batches` seconds.
+        """
+        if not inputs:
+            return []
+        if len(inputs) == 1:
+            return [chain.invoke(inputs[0])]
+        batch_size = batch_size or len(inputs)
+        outputs = []
+        for start in range(0, len(inputs), batch_size):
+            if start and delay_between_batches:
+                time.sleep(delay_between_batches)
+            outputs.extend(chain.batch(inputs[start:start + batch_size], config={"max_concurrency": MAX_CONCURRENCY}))
+        return outputs
+
+    def extract_cache_key(self, cleaned_text: str) -> str:
+        """Content-addressed key for caching extract_jobs results for `cleaned_text`."""
+        data = f"{self.llm.model_name}|{EXTRACT_PROMPT_VERSION}|{cleaned_text}"
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def extract_jobs(self, cleaned_text: str | List[str], batch_size: Optional[int] = None, delay_between_batches: float = 0.0):
+        """Extract job postings from one page of text, or from a list of pages concurrently."""
+        pages = [cleaned_text] if isinstance(cleaned_text, str) else list(cleaned_text)
+        responses = self._batch_invoke(
+            self._extract_chain,
+            [{"page_data": page} for page in pages],
+            batch_size=batch_size,
+            delay_between_batches=delay_between_batches,
         )
-        return res.content
+        jobs = []
+        json_parser = _json_parser()
+        for res in responses:
+            try:
+                res = json_parser.parse(res.content)
+            except OutputParserException:
+                raise OutputParserException("Context too big. Unable to parse jobs.")
+            jobs.extend(res if isinstance(res, list) else [res])
+        return jobs
+
+    def generate_cover_letter(
+        self,
+        job: ExtractedJob | dict,
+        profile: UserProfile,
+        preferences: Preferences,
+        links: Optional[List[str]] = None,
+    ) -> str:
+        """Generate a personalized cover letter based on job, profile, and preferences."""
+        return self.generate_cover_letters_batch([job], profile, preferences, links=[links])[0]
+
+    def stream_cover_letter(
+        self,
+        job: ExtractedJob | dict,
+        profile: UserProfile,
+        preferences: Preferences,
+        links: Optional[List[str]] = None,
+    ) -> Iterator[str]:
+        """Like generate_cover_letter, but yield the letter text as the model produces it."""
+        inputs = _letter_inputs([_coerce_job(job)], profile, preferences, [links])
+        yield from _strip_letter_delimiters(chunk.content for chunk in self._letter_chain.stream(inputs))
+
+    def generate_cover_letters_batch(
+        self,
+        jobs: List[ExtractedJob | dict],
+        profile: UserProfile,
+        preferences: Preferences,
+        links: Optional[List[Optional[List[str]]]] = None,
+        batch_size: Optional[int] = None,
+        delay_between_batches: float = 0.0,
+    ) -> List[str]:
+        """Generate one cover letter per job, packing up to MAX_JOBS_PER_BATCH jobs into each LLM call.
+
+        `links` is aligned with `jobs`; a missing/empty entry falls back to the profile links.
+        The shared profile/preferences part of the prompt is sent once per batch instead of once per job,
+        and the batches themselves are sent concurrently.
+        """
+        jobs, job_links, groups = _letter_groups(jobs, links)
+        letters: List[Optional[str]] = [None] * len(jobs)
+        while groups:
+            responses = self._batch_invoke(
+                self._letter_chain,
+                [_letter_inputs([jobs[i] for i in g], profile, preferences, [job_links[i] for i in g]) for g in groups],
+                batch_size=batch_size,
+                delay_between_batches=delay_between_batches,
+            )
+            groups = _collect_letters(groups, responses, letters)
+        return letters
+
+    async def agenerate_cover_letter(
+        self,
+        job: ExtractedJob | dict,
+        profile: UserProfile,
+        preferences: Preferences,
+        links: Optional[List[str]] = None,
+    ) -> str:
+        """Async generate_cover_letter; await several with asyncio.gather to overlap their network time."""
+        return (await self.agenerate_cover_letters_batch([job], profile, preferences, links=[links]))[0]
+
+    async def agenerate_cover_letters_batch(
+        self,
+        jobs: List[ExtractedJob | dict],
+        profile: UserProfile,
+        preferences: Preferences,
+        links: Optional[List[Optional[List[str]]]] = None,
+    ) -> List[str]:
+        """Async generate_cover_letters_batch: all batch calls are awaited together with asyncio.gather."""
+        jobs, job_links, groups = _letter_groups(jobs, links)
+        letters: List[Optional[str]] = [None] * len(jobs)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+        async def invoke(group: List[int]):
+            async with semaphore:
+                return await self._letter_chain.ainvoke(
+                    _letter_inputs([jobs[i] for i in group], profile, preferences, [job_links[i] for i in group])
+                )
+
+        while groups:
+            responses = await asyncio.gather(*(invoke(g) for g in groups))
+            groups = _collect_letters(groups, responses, letters)
+        return letters
+
+
+def _letter_groups(
+    jobs: List[ExtractedJob | dict],
+    links: Optional[List[Optional[List[str]]]],
+) -> tuple[List[ExtractedJob], List[Optional[List[str]]], List[List[int]]]:
+    """Coerce jobs, align links with them and split their indices into MAX_JOBS_PER_BATCH groups."""
+    jobs = [_coerce_job(j) for j in jobs]
+    job_links = list(links or [])
+    job_links += [None] * (len(jobs) - len(job_links))
+    groups = [list(range(start, min(start + MAX_JOBS_PER_BATCH, len(jobs)))) for start in range(0, len(jobs), MAX_JOBS_PER_BATCH)]
+    return jobs, job_links, groups
+
+
+def _collect_letters(groups: List[List[int]], responses, letters: List[Optional[str]]) -> List[List[int]]:
+    """Fill `letters` from the batch responses; return the single-job groups that need a retry."""
+    retry = []
+    for group, res in zip(groups, responses):
+        parsed = {int(m.group(1)): m.group(2).strip() for m in _LETTER_RE.finditer(res.content)}
+        if len(group) == 1:
+            # A lone letter is usable even if the model skipped the delimiters
+            letters[group[0]] = parsed.get(1) or res.content.strip()
+            continue
+        for pos, i in enumerate(group, start=1):
+            if parsed.get(pos):
+                letters[i] = parsed[pos]
+            else:
+                # Model dropped or mangled this section; regenerate it on its own
+                retry.append([i])
+    return retry
+
+
+def _strip_letter_delimiters(pieces: Iterable[str]) -> Iterator[str]:
+    """Re-yield a streamed single letter without its <<<LETTER 1>>> / <<<END 1>>> delimiters."""
+    start, end = "<<<LETTER 1>>>", "<<<END 1>>>"
+    buf = ""
+    started = False
+    for piece in pieces:
+        buf += piece
+        if not started:
+            head = buf.lstrip()
+            if start.startswith(head):
+                continue  # may still be the opening delimiter
+            buf = head[len(start):].lstrip() if head.startswith(start) else head
+            started = True
+        if end in buf:
+            yield buf.split(end, 1)[0].rstrip()
+            return
+        # Hold back a possible partial closing delimiter
+        keep = len(end) - 1
+        if len(buf) > keep:
+            yield buf[:-keep]
+            buf = buf[-keep:]
+    yield buf.rstrip()
+
+
+@lru_cache(maxsize=1)
+def _json_parser() -> JsonOutputParser:
+    return JsonOutputParser()
+
+
+def _coerce_job(job: ExtractedJob | dict) -> ExtractedJob:
+    # Ensure we can handle dicts from parser gracefully
+    if isinstance(job, dict):
+        return ExtractedJob(**{
+            "role": job.get("role"),
+            "experience": job.get("experience"),
+            "skills": coerce_skills(job.get("skills", [])),
+            "description": job.get("description"),
+        })
+    return job
+
+
+def cover_letter_cache_keys(
+    job: ExtractedJob | dict,
+    profile: UserProfile,
+    preferences: Preferences,
+    links: Optional[List[str]] = None,
+) -> tuple[str, str]:
+    """Return (job_hash, inputs_hash) identifying a generated letter for storage/reuse."""
+    job = _coerce_job(job)
+    job_hash = hashlib.sha256(
+        "|".join([job.role or "", job.experience or "", ",".join(job.skills), job.description or ""]).encode("utf-8")
+    ).hexdigest()
+    inputs = {
+        "version": LETTER_PROMPT_VERSION,
+        "model": os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
+        "profile": profile.model_dump(mode="json"),
+        "preferences": preferences.model_dump(mode="json"),
+        "links": [str(l) for l in (links or profile.links)],
+    }
+    inputs_hash = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+    return job_hash, inputs_hash
+
+
+def _letter_inputs(
+    jobs: List[ExtractedJob],
+    profile: UserProfile,
+    preferences: Preferences,
+    links: List[Optional[List[str]]],
+) -> dict:
+    sections = []
+    for i, (job, job_links) in enumerate(zip(jobs, links), start=1):
+        sections.append(
+            f"### JOB {i}\n"
+            f"- Role: {job.role or ''}\n"
+            f"- Experience: {job.experience or ''}\n"
+            f"- Required/Preferred skills: {truncate_to_tokens(', '.join(job.skills[:20]), JOB_SKILLS_TOKEN_BUDGET)}\n"
+            f"- Relevant links: {', '.join(map(str, (job_links or profile.links)[:5]))}\n"
+            f"- Description:\n{truncate_to_tokens(job.description, JOB_DESCRIPTION_TOKEN_BUDGET)}"
+        )
+    return {
+        "name": profile.name,
+        "education": profile.education or "",
+        "email": profile.email or "",
+        "phone": profile.phone or "",
+        "skills": truncate_to_tokens(", ".join(profile.skills[:20]), PROFILE_SKILLS_TOKEN_BUDGET),
+        "resume_text": truncate_to_tokens(profile.resume_text, RESUME_TOKEN_BUDGET),
+        "jobs": "\n\n".join(sections),
+        "count": len(jobs),
+        "tone": preferences.tone,
+        "style": preferences.style,
+        "length": preferences.length,
+        "template": preferences.template or "",
+    }
+
 
 if __name__ == "__main__":
     print(os.getenv("GROQ_API_KEY"))
\ No newline at end of file
@@ -1,10 +1,13 @@
 import os
-import json
+import base64
+import orjson
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import create_engine, delete, event, func, Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy import text as sql_text
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.orm import declarative_base, relationship, selectinload, sessionmaker, validates, Session
 
 # Database path under app/data
 BASE_DIR = os.path.dirname(__file__)
@@ -16,25 +19,53 @@ DATABASE_URL = f"sqlite:///{DB_PATH}"
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},  # needed for SQLite + threads
+    query_cache_size=1200,  # compiled-statement cache shared by the many identical CRUD queries
+    # Sessions lease already-open (PRAGMA-configured) connections from the pool instead of reconnecting.
+    # No pool_pre_ping: a local SQLite file can't drop the connection, so the ping would be pure overhead
+    pool_size=10,
+    max_overflow=20,
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _):
+    # WAL + NORMAL sync: commits append to the WAL without an fsync (only checkpoints sync); readers don't block the writer
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA cache_size=-65536")  # 64 MiB page cache
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+    cur.close()
+
+
+# expire_on_commit=False: committed objects keep their loaded state, so helpers can return
+# them without a refresh() round trip and callers can read them after the session closes.
+# All column defaults are Python-side and ids come back via lastrowid, so nothing needs reloading.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
 Base = declarative_base()
 
 
-def _json_dump(value: Optional[List[str]]) -> str:
-    try:
-        return json.dumps(value or [])
-    except Exception:
-        return "[]"
+class JSONList(TypeDecorator):
+    """list[str] stored as a JSON array in a TEXT column (orjson-encoded)."""
+
+    impl = Text
+    cache_ok = True
 
+    def process_bind_param(self, value: Optional[List[str]], dialect) -> str:
+        return orjson.dumps(value or []).decode("utf-8")
 
-def _json_load(value: Optional[str]) -> List[str]:
-    try:
-        if not value:
+    def process_result_value(self, value: Optional[str], dialect) -> List[str]:
+        try:
+            return orjson.loads(value) if value else []
+        except orjson.JSONDecodeError:
             return []
-        return json.loads(value)
-    except Exception:
-        return []
+
+
+def new_auth_salt() -> str:
+    """Random per-user salt (32 bytes, base64) for the fast credential-cache digest."""
+    return base64.b64encode(os.urandom(32)).decode("ascii")
 
 
 class User(Base):
@@ -46,12 +77,32 @@ class User(Base):
     password_hash = Column(String(256), nullable=False)
     provider = Column(String(50), nullable=True)       # e.g., 'google'
     provider_id = Column(String(200), nullable=True)   # subject id from provider
+    auth_salt = Column(String(64), nullable=True, default=new_auth_salt)  # salt for verified-credential cache
     created_at = Column(DateTime, default=datetime.utcnow)
 
     profile = relationship("Profile", back_populates="user", uselist=False, cascade="all, delete-orphan")
     portfolio_items = relationship("PortfolioItem", back_populates="user", cascade="all, delete-orphan")
     certifications = relationship("Certification", back_populates="user", cascade="all, delete-orphan")
     experiences = relationship("Experience", back_populates="user", cascade="all, delete-orphan")
+    generated_cover_letters = relationship("GeneratedCoverLetter", back_populates="user", cascade="all, delete-orphan")
+
+    # Case-insensitive lookups (see user_email_matches) use this expression index
+    __table_args__ = (Index("ix_users_email_lower", func.lower(email), unique=True),)
+
+    @validates("email")
+    def _normalize_email(self, key, value):
+        # Emails are stored canonical (trimmed, lowercase) no matter which code path sets them
+        return _canonical_email(value) or None
+
+
+def _canonical_email(email: Optional[str]) -> str:
+    # Done in Python: SQLite's lower() only folds ASCII and trim() only strips spaces
+    return (email or "").strip().lower()
+
+
+def user_email_matches(email: Optional[str]):
+    """Filter clause matching the user with `email`, normalized the same way as User.email."""
+    return func.lower(User.email) == _canonical_email(email)
 
 
 class Profile(Base):
@@ -65,8 +116,8 @@ class Profile(Base):
     email = Column(String(120), nullable=True)
     phone = Column(String(50), nullable=True)
 
-    links_json = Column(Text, default="[]")  # JSON list[str]
-    skills_json = Column(Text, default="[]")  # JSON list[str]
+    links = Column("links_json", JSONList, default=list)  # JSON list[str]
+    skills = Column("skills_json", JSONList, default=list)  # JSON list[str]
     resume_text = Column(Text, nullable=True)
     # Optional stored resume file info
     resume_file_path = Column(String(500), nullable=True)
@@ -79,89 +130,81 @@ class Profile(Base):
 
     user = relationship("User", back_populates="profile")
 
-    # helpers
-    @property
-    def links(self) -> List[str]:
-        return _json_load(self.links_json)
-
-    @links.setter
-    def links(self, value: List[str]):
-        self.links_json = _json_dump(value)
-
-    @property
-    def skills(self) -> List[str]:
-        return _json_load(self.skills_json)
-
-    @skills.setter
-    def skills(self, value: List[str]):
-        self.skills_json = _json_dump(value)
-
 
 class PortfolioItem(Base):
     __tablename__ = "portfolio_items"
+    # Serves the list query (WHERE user_id=? ORDER BY id DESC) as an index range scan
+    __table_args__ = (Index("ix_portfolio_items_user_id_id_desc", "user_id", sql_text("id DESC")),)
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     title = Column(String(200), nullable=False)
     url = Column(String(400), nullable=True)
-    skills_json = Column(Text, default="[]")
+    skills = Column("skills_json", JSONList, default=list)
     description = Column(Text, nullable=True)
 
     user = relationship("User", back_populates="portfolio_items")
 
-    @property
-    def skills(self) -> List[str]:
-        return _json_load(self.skills_json)
-
-    @skills.setter
-    def skills(self, value: List[str]):
-        self.skills_json = _json_dump(value)
-
 
 class Certification(Base):
     __tablename__ = "certifications"
+    # Serves the list query (WHERE user_id=? ORDER BY id DESC) as an index range scan
+    __table_args__ = (Index("ix_certifications_user_id_id_desc", "user_id", sql_text("id DESC")),)
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     title = Column(String(200), nullable=False)
     issuer = Column(String(200), nullable=True)
     date = Column(String(50), nullable=True)  # free-form date string
-    skills_json = Column(Text, default="[]")
+    skills = Column("skills_json", JSONList, default=list)
 
     user = relationship("User", back_populates="certifications")
 
-    @property
-    def skills(self) -> List[str]:
-        return _json_load(self.skills_json)
-
-    @skills.setter
-    def skills(self, value: List[str]):
-        self.skills_json = _json_dump(value)
-
 
 class Experience(Base):
     __tablename__ = "experiences"
+    # Serves the list query (WHERE user_id=? ORDER BY id DESC) as an index range scan
+    __table_args__ = (Index("ix_experiences_user_id_id_desc", "user_id", sql_text("id DESC")),)
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     role = Column(String(200), nullable=False)
     organization = Column(String(200), nullable=True)
     years = Column(String(50), nullable=True)
-    skills_json = Column(Text, default="[]")
+    skills = Column("skills_json", JSONList, default=list)
     description = Column(Text, nullable=True)
 
     user = relationship("User", back_populates="experiences")
 
-    @property
-    def skills(self) -> List[str]:
-        return _json_load(self.skills_json)
 
-    @skills.setter
-    def skills(self, value: List[str]):
-        self.skills_json = _json_dump(value)
+class GeneratedCoverLetter(Base):
+    """A generated letter, keyed by content hashes of the job and of the generation inputs."""
+
+    __tablename__ = "generated_cover_letters"
+    __table_args__ = (Index("ix_generated_cover_letters_lookup", "user_id", "job_hash", "inputs_hash"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    job_hash = Column(String(64), nullable=False)     # sha256 of the job fields
+    inputs_hash = Column(String(64), nullable=False)  # sha256 of profile + preferences + links
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    user = relationship("User", back_populates="generated_cover_letters")
+
+
+class LLMCacheEntry(Base):
+    """Stored LLM output keyed by a hash of model + prompt version + input text."""
+
+    __tablename__ = "llm_cache"
+
+    key = Column(String(64), primary_key=True)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 # Create tables on import
@@ -171,38 +214,51 @@ Base.metadata.create_all(bind=engine)
 # Session helpers
 
 def get_session() -> Session:
+    # Short-lived unit of work; its connection goes back to the engine pool on close
     return SessionLocal()
 
 
-def _column_exists(table: str, column: str) -> bool:
-    with engine.connect() as conn:
-        res = conn.execute(sql_text(f"PRAGMA table_info({table})"))
-        cols = [row[1] for row in res.fetchall()]
-        return column in cols
+# Columns added after tables were first created: table -> [(column, DDL type)]
+_ADDED_COLUMNS = {
+    "profiles": [
+        ("bio", "TEXT"),
+        ("linkedin", "VARCHAR(400)"),
+        ("github", "VARCHAR(400)"),
+        # resume file metadata
+        ("resume_file_path", "VARCHAR(500)"),
+        ("resume_file_name", "VARCHAR(200)"),
+        ("resume_file_mime", "VARCHAR(100)"),
+    ],
+    "users": [
+        ("provider", "VARCHAR(50)"),
+        ("provider_id", "VARCHAR(200)"),
+        ("auth_salt", "VARCHAR(64)"),  # backfilled lazily on next successful login
+    ],
+}
 
 
 def ensure_schema():
-    """Lightweight migrations for SQLite: add missing columns if needed."""
-    # Profile: bio, linkedin, github
-    with engine.connect() as conn:
-        if not _column_exists("profiles", "bio"):
-            conn.execute(sql_text("ALTER TABLE profiles ADD COLUMN bio TEXT"))
-        if not _column_exists("profiles", "linkedin"):
-            conn.execute(sql_text("ALTER TABLE profiles ADD COLUMN linkedin VARCHAR(400)"))
-        if not _column_exists("profiles", "github"):
-            conn.execute(sql_text("ALTER TABLE profiles ADD COLUMN github VARCHAR(400)"))
-        # Profile: resume file metadata
-        if not _column_exists("profiles", "resume_file_path"):
-            conn.execute(sql_text("ALTER TABLE profiles ADD COLUMN resume_file_path VARCHAR(500)"))
-        if not _column_exists("profiles", "resume_file_name"):
-            conn.execute(sql_text("ALTER TABLE profiles ADD COLUMN resume_file_name VARCHAR(200)"))
-        if not _column_exists("profiles", "resume_file_mime"):
-            conn.execute(sql_text("ALTER TABLE profiles ADD COLUMN resume_file_mime VARCHAR(100)"))
-        # Users: provider, provider_id
-        if not _column_exists("users", "provider"):
-            conn.execute(sql_text("ALTER TABLE users ADD COLUMN provider VARCHAR(50)"))
-        if not _column_exists("users", "provider_id"):
-            conn.execute(sql_text("ALTER TABLE users ADD COLUMN provider_id VARCHAR(200)"))
+    """Lightweight migrations for SQLite: add missing columns and indexes if needed.
+
+    Runs on a single connection in one transaction, with one PRAGMA table_info per table.
+    """
+    with engine.begin() as conn:
+        # pysqlite doesn't open a transaction for DDL on its own
+        conn.exec_driver_sql("BEGIN")
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+            for column, ddl_type in columns:
+                if column not in existing:
+                    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}")
+        # Composite (user_id, id DESC) indexes for the list_* queries; they supersede
+        # the old single-column user_id indexes
+        for model in (PortfolioItem, Certification, Experience):
+            for index in model.__table__.indexes:
+                index.create(conn, checkfirst=True)
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{model.__tablename__}_user_id")
+        # Expression index: checkfirst can't reflect it, so let SQLite skip it if present
+        for index in User.__table__.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
 
 
 # Run migrations on import
@@ -219,7 +275,6 @@ def get_or_create_profile(db: Session, user_id: int) -> Profile:
     prof = Profile(user_id=user_id, name="")
     db.add(prof)
     db.commit()
-    db.refresh(prof)
     return prof
 
 
@@ -254,10 +309,26 @@ def update_profile(
         prof.resume_file_mime = resume_file_mime
     db.add(prof)
     db.commit()
-    db.refresh(prof)
     return prof
 
 
+def load_user_bundle(db: Session, user_id: int) -> Optional[User]:
+    """Load a user with profile, portfolio items, certifications and experiences.
+
+    One SELECT for the user plus one IN-query per relationship, instead of a query per list.
+    """
+    return db.get(
+        User,
+        user_id,
+        options=[
+            selectinload(User.profile),
+            selectinload(User.portfolio_items),
+            selectinload(User.certifications),
+            selectinload(User.experiences),
+        ],
+    )
+
+
 def list_portfolio_items(db: Session, user_id: int) -> list[PortfolioItem]:
     return db.query(PortfolioItem).filter(PortfolioItem.user_id == user_id).order_by(PortfolioItem.id.desc()).all()
 
@@ -277,15 +348,16 @@ def upsert_portfolio_item(
     item.description = description
     db.add(item)
     db.commit()
-    db.refresh(item)
     return item
 
 
-def delete_portfolio_item(db: Session, user_id: int, item_id: int) -> None:
-    item = db.query(PortfolioItem).filter(PortfolioItem.id == item_id, PortfolioItem.user_id == user_id).first()
-    if item:
-        db.delete(item)
-        db.commit()
+def delete_portfolio_item(db: Session, user_id: int, item_id: int) -> Optional[int]:
+    """Delete the user's row in a single DELETE ... RETURNING; return its id, or None if not found."""
+    deleted_id = db.scalar(
+        delete(PortfolioItem).where(PortfolioItem.id == item_id, PortfolioItem.user_id == user_id).returning(PortfolioItem.id)
+    )
+    db.commit()
+    return deleted_id
 
 
 def list_certifications(db: Session, user_id: int) -> list[Certification]:
@@ -314,15 +386,16 @@ def upsert_certification(
     cert.skills = skills or []
     db.add(cert)
     db.commit()
-    db.refresh(cert)
     return cert
 
 
-def delete_certification(db: Session, user_id: int, cert_id: int) -> None:
-    cert = db.query(Certification).filter(Certification.id == cert_id, Certification.user_id == user_id).first()
-    if cert:
-        db.delete(cert)
-        db.commit()
+def delete_certification(db: Session, user_id: int, cert_id: int) -> Optional[int]:
+    """Delete the user's row in a single DELETE ... RETURNING; return its id, or None if not found."""
+    deleted_id = db.scalar(
+        delete(Certification).where(Certification.id == cert_id, Certification.user_id == user_id).returning(Certification.id)
+    )
+    db.commit()
+    return deleted_id
 
 
 def list_experiences(db: Session, user_id: int) -> list[Experience]:
@@ -353,12 +426,45 @@ def upsert_experience(
     exp.description = description
     db.add(exp)
     db.commit()
-    db.refresh(exp)
     return exp
 
 
-def delete_experience(db: Session, user_id: int, exp_id: int) -> None:
-    exp = db.query(Experience).filter(Experience.id == exp_id, Experience.user_id == user_id).first()
-    if exp:
-        db.delete(exp)
-        db.commit()
+def delete_experience(db: Session, user_id: int, exp_id: int) -> Optional[int]:
+    """Delete the user's row in a single DELETE ... RETURNING; return its id, or None if not found."""
+    deleted_id = db.scalar(
+        delete(Experience).where(Experience.id == exp_id, Experience.user_id == user_id).returning(Experience.id)
+    )
+    db.commit()
+    return deleted_id
+
+
+def get_generated_cover_letter(db: Session, user_id: int, job_hash: str, inputs_hash: str) -> Optional[GeneratedCoverLetter]:
+    return (
+        db.query(GeneratedCoverLetter)
+        .filter(
+            GeneratedCoverLetter.user_id == user_id,
+            GeneratedCoverLetter.job_hash == job_hash,
+            GeneratedCoverLetter.inputs_hash == inputs_hash,
+        )
+        .order_by(GeneratedCoverLetter.id.desc())
+        .first()
+    )
+
+
+def save_generated_cover_letter(
+    db: Session, user_id: int, *, job_hash: str, inputs_hash: str, content: str
+) -> GeneratedCoverLetter:
+    letter = GeneratedCoverLetter(user_id=user_id, job_hash=job_hash, inputs_hash=inputs_hash, content=content)
+    db.add(letter)
+    db.commit()
+    return letter
+
+
+def get_llm_cache(db: Session, key: str) -> Optional[str]:
+    entry = db.get(LLMCacheEntry, key)
+    return entry.response if entry else None
+
+
+def put_llm_cache(db: Session, key: str, response: str) -> None:
+    db.merge(LLMCacheEntry(key=key, response=response, created_at=datetime.utcnow()))
+    db.commit()
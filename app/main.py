@@ -1,8 +1,20 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
-import base64
+import re
+import json
+import string
+try:
+    # SIMD-accelerated drop-in for the stdlib module (used for the resume PDF preview)
+    import pybase64 as base64
+except ImportError:
+    import base64
+import shutil
+import time
+from datetime import datetime
+from functools import lru_cache
 from langchain_community.document_loaders import WebBaseLoader
-from chains import Chain
+from chains import Chain, cover_letter_cache_keys
 from portfolio import UserPortfolioRAG
 from models import UserProfile, Preferences
 from utils import (
@@ -13,7 +25,15 @@ from utils import (
     extract_text_from_upload,
     safe_truncate,
 )
-from auth import authenticate_user, create_user, upsert_user_oauth
+from auth import (
+    AUTH_COOKIE_MAX_AGE,
+    AUTH_COOKIE_NAME,
+    authenticate_user,
+    create_user,
+    make_auth_token,
+    user_from_auth_token,
+    upsert_user_oauth,
+)
 from oauth import google_login_button, has_google_oauth_config, can_render_google_button, oauth_diagnostics
 from dotenv import load_dotenv
 
@@ -31,11 +51,20 @@ from db import (
     list_experiences,
     upsert_experience,
     delete_experience,
+    load_user_bundle,
+    get_generated_cover_letter,
+    get_llm_cache,
+    put_llm_cache,
+    save_generated_cover_letter,
 )
 from email_validator import validate_email, EmailNotValidError
 
 
+# persist="disk" survives restarts; Streamlit ignores ttl for disk-persisted caches,
+# so stale pages are refreshed with the "Refresh" button instead
+@st.cache_data(show_spinner=False, persist="disk", max_entries=500)
 def get_job_text_from_url(url: str) -> str:
+    # Cached per URL: reruns (e.g. "Generate" after "Fetch job details") skip the fetch and parse
     loader = WebBaseLoader([url])
     docs = loader.load()
     if not docs:
@@ -43,39 +72,153 @@ def get_job_text_from_url(url: str) -> str:
     return clean_text(docs[0].page_content)
 
 
+@st.cache_resource(show_spinner=False)
+def get_chain() -> Chain:
+    # One LLM client per process, shared by every rerun and session
+    return Chain()
+
+
+@st.cache_resource(show_spinner=False)
+def get_rag() -> UserPortfolioRAG:
+    # One Chroma client/collection handle per process
+    return UserPortfolioRAG()
+
+
 def ensure_session_keys():
     for k, v in {
         "user_id": None,
         "user_email": None,
         "active_page": "Generate",
+        "fetched_job_text": {},  # url -> text from the last "Fetch job details"
+        "auth_cookie_checked": False,
+        "pending_auth_cookie": None,  # token to write on the next run; "" clears the cookie
     }.items():
         if k not in st.session_state:
             st.session_state[k] = v
 
 
+def _restore_login_from_cookie():
+    # Request cookies are fixed for the whole browser session, so only look once
+    # (otherwise a logout would be undone by the stale cookie on the next rerun)
+    if st.session_state.auth_cookie_checked:
+        return
+    st.session_state.auth_cookie_checked = True
+    if st.session_state.user_id:
+        return
+    token = st.context.cookies.get(AUTH_COOKIE_NAME)
+    if not token:
+        return
+    with get_session() as db:
+        user = user_from_auth_token(db, token)
+    if user is None:
+        # Invalid, expired, or for an account that no longer exists: drop the cookie
+        st.session_state.pending_auth_cookie = ""
+        return
+    st.session_state.user_id = user.id
+    st.session_state.user_email = user.email
+
+
+def _log_in(user, email: str | None = None):
+    st.session_state.user_id = user.id
+    st.session_state.user_email = user.email or email
+    token = make_auth_token(user)
+    if token:
+        st.session_state.pending_auth_cookie = token
+
+
+def _write_pending_auth_cookie():
+    # Set from the browser: Streamlit has no API to send Set-Cookie on the websocket
+    token = st.session_state.pending_auth_cookie
+    if token is None:
+        return
+    st.session_state.pending_auth_cookie = None
+    max_age = AUTH_COOKIE_MAX_AGE if token else 0
+    components.html(
+        f"<script>window.parent.document.cookie = "
+        f"'{AUTH_COOKIE_NAME}={token}; Max-Age={max_age}; Path=/; SameSite=Strict';</script>",
+        height=0,
+    )
+
+
 def _is_valid_email(email: str) -> bool:
+    # Normalize first so the cache key matches how emails are stored
+    return _is_valid_normalized_email((email or "").strip().lower())
+
+
+@lru_cache(maxsize=1024)
+def _is_valid_normalized_email(email: str) -> bool:
+    # Forms are re-validated on every rerun; validation is pure, so memoize it
     try:
-        validate_email(email or "", check_deliverability=False)
+        validate_email(email, check_deliverability=False)
         return True
     except EmailNotValidError:
         return False
 
 
+# Character classes for the password strength check
+PASSWORD_LOWER = frozenset(string.ascii_lowercase)
+PASSWORD_UPPER = frozenset(string.ascii_uppercase)
+PASSWORD_DIGITS = frozenset(string.digits)
+PASSWORD_SPECIALS = frozenset("!@#$%^&*()_+-=[]{}|;:'\",.<>/?`~")
+
+
 def _password_strength_errors(pw: str) -> list[str]:
     errors = []
     if len(pw) < 8:
         errors.append("At least 8 characters")
-    if not any(c.islower() for c in pw):
+    chars = set(pw)  # one pass over the password; each check below is a set intersection
+    if not chars & PASSWORD_LOWER:
         errors.append("Include a lowercase letter")
-    if not any(c.isupper() for c in pw):
+    if not chars & PASSWORD_UPPER:
         errors.append("Include an uppercase letter")
-    if not any(c.isdigit() for c in pw):
+    if not chars & PASSWORD_DIGITS:
         errors.append("Include a number")
-    if not any(c in "!@#$%^&*()_+-=[]{}|;:'\",.<>/?`~" for c in pw):
+    if not chars & PASSWORD_SPECIALS:
         errors.append("Include a special character")
     return errors
 
 
+# Sidebar navigation: (page name, icon)
+NAV_ITEMS = (
+    ("Generate", "✨"),
+    ("Profile", "👤"),
+    ("Portfolio", "🗂️"),
+    ("Certifications", "🎓"),
+    ("Experiences", "💼"),
+    ("Docs", "📘"),
+)
+NAV_LABELS = tuple(f"{icon} {name}" for name, icon in NAV_ITEMS)
+NAV_NAME_BY_LABEL = {label: name for label, (name, _) in zip(NAV_LABELS, NAV_ITEMS)}
+NAV_INDEX_BY_NAME = {name: i for i, (name, _) in enumerate(NAV_ITEMS)}
+
+_NAV_HEADER_HTML = """
+<div class="cbb-side-section-header">
+  <span class="cbb-side-title">Navigation</span>
+  <span class="cbb-side-chevron">⌄</span>
+</div>
+"""
+
+_SIDEBAR_NAV_CSS = """
+<style>
+/* Sidebar section header */
+.cbb-side-section-header {display:flex; align-items:center; justify-content:space-between; padding:6px 4px 2px 4px;}
+.cbb-side-title {font-weight:600; color:#ddd;}
+.cbb-side-chevron {color:#aaa;}
+
+/* Radio group styling to resemble clean nav list */
+[data-testid="stSidebar"] div[role="radiogroup"] > label {
+    display:flex; align-items:center; gap:10px; padding:8px 10px; border-radius:8px; margin:4px 0; border:1px solid transparent;
+}
+[data-testid="stSidebar"] div[role="radiogroup"] > label:hover {
+    background:#1b1f2a; border-color:#2a3142;
+}
+[data-testid="stSidebar"] div[role="radiogroup"] > div label p {
+    margin:0; padding:0; font-weight:500;
+}
+</style>
+"""
+
+
 def sidebar_auth_and_nav():
     st.sidebar.header("Account")
     if st.session_state.get("user_id"):
@@ -83,37 +226,19 @@ def sidebar_auth_and_nav():
         if st.sidebar.button("Log out"):
             st.session_state.user_id = None
             st.session_state.user_email = None
+            st.session_state.pending_auth_cookie = ""
             st.rerun()
         st.sidebar.divider()
         _inject_sidebar_nav_css()
-        st.sidebar.markdown(
-            """
-            <div class=\"cbb-side-section-header\">
-              <span class=\"cbb-side-title\">Navigation</span>
-              <span class=\"cbb-side-chevron\">⌄</span>
-            </div>
-            """,
-            unsafe_allow_html=True,
-        )
-        nav_items = [
-            ("Generate", "✨"),
-            ("Profile", "👤"),
-            ("Portfolio", "🗂️"),
-            ("Certifications", "🎓"),
-            ("Experiences", "💼"),
-            ("Docs", "📘"),
-        ]
-        labels = [f"{icon} {name}" for name, icon in nav_items]
-        by_label = {f"{icon} {name}": name for name, icon in nav_items}
+        st.sidebar.markdown(_NAV_HEADER_HTML, unsafe_allow_html=True)
         current = st.session_state.get("active_page") or "Generate"
-        current_label = [l for l in labels if by_label[l] == current][0]
         choice = st.sidebar.radio(
             label="Go to",
-            options=labels,
-            index=labels.index(current_label),
+            options=NAV_LABELS,
+            index=NAV_INDEX_BY_NAME[current],
             label_visibility="collapsed",
         )
-        st.session_state.active_page = by_label[choice]
+        st.session_state.active_page = NAV_NAME_BY_LABEL[choice]
     else:
         # OAuth login shown first in the sidebar
         if can_render_google_button():
@@ -129,8 +254,7 @@ def sidebar_auth_and_nav():
                             email=info.get("email"),
                             name=info.get("name"),
                         )
-                    st.session_state.user_id = user.id
-                    st.session_state.user_email = user.email or info.get("email")
+                    _log_in(user, info.get("email"))
                     st.success("Logged in with Google!")
                     st.rerun()
                 except Exception as e:
@@ -160,8 +284,7 @@ def sidebar_auth_and_nav():
                 with get_session() as db:
                     user = authenticate_user(db, lemail, lpassword)
                 if user:
-                    st.session_state.user_id = user.id
-                    st.session_state.user_email = user.email
+                    _log_in(user)
                     st.success("Logged in!")
                     st.rerun()
                 else:
@@ -199,34 +322,66 @@ def sidebar_auth_and_nav():
     )
 
 
+# Runs of characters not allowed in stored upload names
+_UNSAFE_FILENAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
 def _save_uploaded_resume(user_id: int, uploaded_file) -> tuple[str, str, str]:
     # Returns (saved_path, original_name, mime_type)
     uploads_dir = os.path.join(os.path.dirname(__file__), "data", "uploads", str(user_id))
     os.makedirs(uploads_dir, exist_ok=True)
     original_name = getattr(uploaded_file, "name", "resume")
     # basic sanitize
-    safe_name = "".join(c for c in original_name if c.isalnum() or c in (".", "_", "-")) or "resume"
-    import time
+    safe_name = _UNSAFE_FILENAME_RE.sub("_", original_name) or "resume"
     ts = int(time.time())
     fname = f"{ts}_{safe_name}"
     saved_path = os.path.join(uploads_dir, fname)
-    # Write bytes
+    # Stream to disk in chunks, then rewind so the text extraction can read it again
+    uploaded_file.seek(0)
     with open(saved_path, "wb") as out:
-        out.write(uploaded_file.getbuffer())
+        shutil.copyfileobj(uploaded_file, out, 64 * 1024)
+    uploaded_file.seek(0)
     mime_type = getattr(uploaded_file, "type", None) or "application/octet-stream"
     return saved_path, original_name, mime_type
 
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def _read_file_bytes(file_path: str, mtime: float, size: int) -> bytes:
+    # Keyed on mtime/size so reruns don't re-read an unchanged file from disk
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+PDF_B64_CHUNK_BYTES = 48 * 1024  # multiple of 3: chunk encodings concatenate without padding
+
+
 def _pdf_embed_html(file_path: str, height: int = 480) -> str:
     try:
+        stat = os.stat(file_path)
+    except OSError:
+        return ""
+    return _pdf_embed_html_cached(file_path, stat.st_mtime, stat.st_size, height)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _pdf_embed_html_cached(file_path: str, mtime: float, size: int, height: int) -> str:
+    # mtime/size are only part of the cache key: a replaced file gets re-encoded
+    try:
+        parts = []
         with open(file_path, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode("utf-8")
+            # Encode in 3-byte-aligned chunks so the raw file is never fully resident next to its base64
+            while chunk := f.read(PDF_B64_CHUNK_BYTES):
+                parts.append(base64.b64encode(chunk).decode("ascii"))
+        b64 = "".join(parts)
         return f'<iframe src="data:application/pdf;base64,{b64}#toolbar=0" width="100%" height="{height}" style="border:1px solid #222; border-radius:6px;"></iframe>'
     except Exception:
         return ""
 
 
+@st.fragment
 def profile_tab(rag: UserPortfolioRAG):
+    # Tabs are fragments: their widgets rerun only the tab, not the sidebar/auth flow.
+    # Their st.rerun calls use scope="fragment" for the same reason.
     st.subheader("Profile")
     user_id = st.session_state.get("user_id")
     if not user_id:
@@ -242,13 +397,13 @@ def profile_tab(rag: UserPortfolioRAG):
                 st.write(f"Stored file: {os.path.basename(prof.resume_file_path)}")
                 # Offer download of the original file
                 try:
-                    with open(prof.resume_file_path, "rb") as f:
-                        st.download_button(
-                            label="Download original CV",
-                            data=f.read(),
-                            file_name=prof.resume_file_name or os.path.basename(prof.resume_file_path),
-                            mime=prof.resume_file_mime or "application/octet-stream",
-                        )
+                    stat = os.stat(prof.resume_file_path)
+                    st.download_button(
+                        label="Download original CV",
+                        data=_read_file_bytes(prof.resume_file_path, stat.st_mtime, stat.st_size),
+                        file_name=prof.resume_file_name or os.path.basename(prof.resume_file_path),
+                        mime=prof.resume_file_mime or "application/octet-stream",
+                    )
                 except Exception as e:
                     st.warning(f"Couldn't read stored file: {e}")
                 # Preview PDF inline if it's a PDF
@@ -324,40 +479,11 @@ def profile_tab(rag: UserPortfolioRAG):
             db.add(prof)
             db.commit()
             # Reindex RAG with updated data
-            rag.reindex_user(
-                user_id,
-                profile={
-                    "name": prof.name,
-                    "education": prof.education,
-                    "skills": prof.skills,
-                    "links": prof.links,
-                    "bio": prof.bio,
-                    "linkedin": prof.linkedin,
-                    "github": prof.github,
-                },
-                portfolio_items=[
-                    {"id": it.id, "title": it.title, "url": it.url, "skills": it.skills, "description": it.description}
-                    for it in list_portfolio_items(db, user_id)
-                ],
-                certifications=[
-                    {"id": c.id, "title": c.title, "issuer": c.issuer, "date": c.date, "skills": c.skills}
-                    for c in list_certifications(db, user_id)
-                ],
-                experiences=[
-                    {
-                        "id": e.id,
-                        "role": e.role,
-                        "organization": e.organization,
-                        "years": e.years,
-                        "skills": e.skills,
-                        "description": e.description,
-                    }
-                    for e in list_experiences(db, user_id)
-                ],
-            )
+            _reindex_user_quick(db, rag, user_id)
         st.success("Profile saved")
 
 
+@st.fragment
 def portfolio_tab(rag: UserPortfolioRAG):
     st.subheader("Portfolio items")
     user_id = st.session_state.get("user_id")
@@ -383,9 +509,10 @@ def portfolio_tab(rag: UserPortfolioRAG):
             edit_target = it
         if col_del.button("Delete", key=f"del_pf_{it.id}"):
             with get_session() as db:
-                delete_portfolio_item(db, user_id, it.id)
-                _reindex_user_quick(db, rag, user_id)
-            st.rerun()
+                deleted_id = delete_portfolio_item(db, user_id, it.id)
+            if deleted_id:
+                rag.delete_item(user_id, "portfolio_item", deleted_id)
+            st.rerun(scope="fragment")
 
     st.divider()
     st.markdown("### Add / Update Item")
@@ -414,13 +541,14 @@ def portfolio_tab(rag: UserPortfolioRAG):
                     skills=parse_skills(skills_text),
                     description=description.strip() or None,
                 )
-                _reindex_user_quick(db, rag, user_id)
+            rag.upsert_item(user_id, "portfolio_item", item)
             st.success(f"Saved item #{item.id}")
-            st.rerun()
+            st.rerun(scope="fragment")
         except Exception as e:
             st.error(f"Failed to save: {e}")
 
 
+@st.fragment
 def certifications_tab(rag: UserPortfolioRAG):
     st.subheader("Certifications")
     user_id = st.session_state.get("user_id")
@@ -445,9 +573,10 @@ def certifications_tab(rag: UserPortfolioRAG):
             edit_target = c
         if col_del.button("Delete", key=f"del_cert_{c.id}"):
             with get_session() as db:
-                delete_certification(db, user_id, c.id)
-                _reindex_user_quick(db, rag, user_id)
-            st.rerun()
+                deleted_id = delete_certification(db, user_id, c.id)
+            if deleted_id:
+                rag.delete_item(user_id, "certification", deleted_id)
+            st.rerun(scope="fragment")
 
     st.divider()
     st.markdown("### Add / Update Certification")
@@ -476,13 +605,14 @@ def certifications_tab(rag: UserPortfolioRAG):
                     date=date.strip() or None,
                     skills=parse_skills(skills_text),
                 )
-                _reindex_user_quick(db, rag, user_id)
+            rag.upsert_item(user_id, "certification", cert)
             st.success(f"Saved certification #{cert.id}")
-            st.rerun()
+            st.rerun(scope="fragment")
         except Exception as e:
             st.error(f"Failed to save: {e}")
 
 
+@st.fragment
 def experiences_tab(rag: UserPortfolioRAG):
     st.subheader("Experiences")
     user_id = st.session_state.get("user_id")
@@ -509,9 +639,10 @@ def experiences_tab(rag: UserPortfolioRAG):
             edit_target = e
         if col_del.button("Delete", key=f"del_exp_{e.id}"):
             with get_session() as db:
-                delete_experience(db, user_id, e.id)
-                _reindex_user_quick(db, rag, user_id)
-            st.rerun()
+                deleted_id = delete_experience(db, user_id, e.id)
+            if deleted_id:
+                rag.delete_item(user_id, "experience", deleted_id)
+            st.rerun(scope="fragment")
 
     st.divider()
     st.markdown("### Add / Update Experience")
@@ -543,43 +674,27 @@ def experiences_tab(rag: UserPortfolioRAG):
                     skills=parse_skills(skills_text),
                     description=description.strip() or None,
                 )
-                _reindex_user_quick(db, rag, user_id)
+            rag.upsert_item(user_id, "experience", exp)
             st.success(f"Saved experience #{exp.id}")
-            st.rerun()
+            st.rerun(scope="fragment")
         except Exception as e:
             st.error(f"Failed to save: {e}")
 
 
 def _reindex_user_quick(db_session, rag: UserPortfolioRAG, user_id: int):
-    # Helper to rebuild the user's index using current DB state
-    prof = get_or_create_profile(db_session, user_id)
+    # Helper to rebuild the user's index using current DB state (one bundle load, not four queries)
+    bundle = load_user_bundle(db_session, user_id)
+    if bundle is None:
+        # Cookie logins are checked against the DB, but the account can still be removed mid-session
+        return
+    prof = bundle.profile or get_or_create_profile(db_session, user_id)
+    # ORM rows are passed as-is; the RAG reads their attributes directly
     rag.reindex_user(
         user_id,
-        profile={
-            "name": prof.name,
-            "education": prof.education,
-            "skills": prof.skills,
-            "links": prof.links,
-        },
-        portfolio_items=[
-            {"id": it.id, "title": it.title, "url": it.url, "skills": it.skills, "description": it.description}
-            for it in list_portfolio_items(db_session, user_id)
-        ],
-        certifications=[
-            {"id": c.id, "title": c.title, "issuer": c.issuer, "date": c.date, "skills": c.skills}
-            for c in list_certifications(db_session, user_id)
-        ],
-        experiences=[
-            {
-                "id": e.id,
-                "role": e.role,
-                "organization": e.organization,
-                "years": e.years,
-                "skills": e.skills,
-                "description": e.description,
-            }
-            for e in list_experiences(db_session, user_id)
-        ],
+        profile=prof,
+        portfolio_items=bundle.portfolio_items,
+        certifications=bundle.certifications,
+        experiences=bundle.experiences,
     )
 
 
@@ -610,19 +725,32 @@ def generate_tab(chain: Chain, rag: UserPortfolioRAG):
     if input_mode == "URL":
         url_input = st.text_input("Job posting URL", value="")
         if url_input and validate_url(url_input):
-            if st.button("Fetch job details"):
+            fcol, rcol = st.columns([1, 1])
+            with fcol:
+                fetch = st.button("Fetch job details")
+            with rcol:
+                refresh = st.button("Refresh", help="Fetch the page again instead of using the cached copy")
+            if refresh:
+                # Drop only this URL's cached page; other users' and URLs' entries stay
+                get_job_text_from_url.clear(url_input)
+            if fetch or refresh:
                 try:
                     job_text = get_job_text_from_url(url_input)
                     if not job_text:
                         st.warning("Couldn't extract text from the URL. Try pasting the description instead.")
+                    # Keep it for the next rerun (e.g. the Generate click) instead of fetching again
+                    st.session_state.fetched_job_text = {url_input: job_text}
                 except Exception as e:
                     st.error(f"Failed to fetch URL: {e}")
+            else:
+                job_text = st.session_state.fetched_job_text.get(url_input, "")
         elif url_input:
             st.warning("Please enter a valid http(s) URL.")
     else:
         job_text = st.text_area("Paste job description", height=240)
 
     st.divider()
+    force_fresh = st.checkbox("Write new drafts (ignore previously generated letters)", value=False)
     submit = st.button("Generate Cover Letter", type="primary")
     if submit:
         if input_mode == "URL" and not (url_input and validate_url(url_input)) and not job_text:
@@ -637,13 +765,22 @@ def generate_tab(chain: Chain, rag: UserPortfolioRAG):
             if not (prof.name or "").strip():
                 st.error("Please complete your Profile (name) before generating.")
                 return
-            # Ensure RAG index exists for user
-            _reindex_user_quick(db, rag, user_id)
-        try:
-            jobs = chain.extract_jobs(source_text)
-        except Exception as e:
-            st.error(f"Couldn't parse job data from the posting. You can paste the description directly. Details: {e}")
-            return
+            # Build the user's RAG index only if it doesn't exist yet; edits keep it current
+            if not rag.has_user_index(user_id):
+                _reindex_user_quick(db, rag, user_id)
+            # Re-scraped/re-pasted postings reuse the stored extraction instead of calling Groq again
+            extract_key = chain.extract_cache_key(source_text)
+            cached_jobs = get_llm_cache(db, extract_key)
+        if cached_jobs is not None:
+            jobs = json.loads(cached_jobs)
+        else:
+            try:
+                jobs = chain.extract_jobs(source_text)
+            except Exception as e:
+                st.error(f"Couldn't parse job data from the posting. You can paste the description directly. Details: {e}")
+                return
+            with get_session() as db:
+                put_llm_cache(db, extract_key, json.dumps(jobs))
 
         profile_model = UserProfile(
             name=prof.name or "",
@@ -656,30 +793,66 @@ def generate_tab(chain: Chain, rag: UserPortfolioRAG):
         )
 
         st.subheader("Generated Cover Letter(s)")
-        for idx, job in enumerate(jobs, start=1):
+        job_links = []
+        for job in jobs:
             job_skills = job.get('skills') if isinstance(job, dict) else getattr(job, 'skills', [])
             search_skills = list({*(prof.skills or []), *([s for s in (job_skills or [])])})
             portfolio_links = rag.query_links(user_id, search_skills, n_results=3)
+            job_links.append(portfolio_links or prof.links)
+        # Reuse letters already generated for the same job and inputs
+        keys = [cover_letter_cache_keys(job, profile_model, preferences, links) for job, links in zip(jobs, job_links)]
+        letters = [None] * len(jobs)
+        if not force_fresh:
+            with get_session() as db:
+                for i, (job_hash, inputs_hash) in enumerate(keys):
+                    stored = get_generated_cover_letter(db, user_id, job_hash, inputs_hash)
+                    if stored:
+                        letters[i] = stored.content
+        missing = [i for i, letter in enumerate(letters) if letter is None]
+        # A single new letter is streamed below; several are generated concurrently (Runnable.batch).
+        # The async API isn't used here: the cached Chain's async client is bound to the first event loop.
+        if len(missing) > 1:
             try:
-                letter = chain.generate_cover_letter(job, profile_model, preferences, links=(portfolio_links or prof.links))
-                st.markdown(f"### Option {idx}")
-                st.write(letter)
-                st.download_button(
-                    label="Download as .txt",
-                    data=letter,
-                    file_name=f"cover_letter_{idx}.txt",
-                    mime="text/plain",
+                generated = chain.generate_cover_letters_batch(
+                    [jobs[i] for i in missing], profile_model, preferences, links=[job_links[i] for i in missing]
                 )
             except Exception as e:
                 st.error(f"Generation failed: {e}")
+                return
+            with get_session() as db:
+                for i, letter in zip(missing, generated):
+                    letters[i] = letter
+                    save_generated_cover_letter(db, user_id, job_hash=keys[i][0], inputs_hash=keys[i][1], content=letter)
+        for idx, letter in enumerate(letters, start=1):
+            st.markdown(f"### Option {idx}")
+            if letter is None:
+                try:
+                    letter = st.write_stream(
+                        chain.stream_cover_letter(jobs[idx - 1], profile_model, preferences, links=job_links[idx - 1])
+                    )
+                except Exception as e:
+                    st.error(f"Generation failed: {e}")
+                    continue
+                job_hash, inputs_hash = keys[idx - 1]
+                with get_session() as db:
+                    save_generated_cover_letter(db, user_id, job_hash=job_hash, inputs_hash=inputs_hash, content=letter)
+            else:
+                st.write(letter)
+            st.download_button(
+                label="Download as .txt",
+                data=letter,
+                file_name=f"cover_letter_{idx}.txt",
+                mime="text/plain",
+            )
 
 
 def create_streamlit_app(chain: Chain, rag: UserPortfolioRAG):
     # Resolve logo path for page icon (falls back to emoji if not found)
-    logo_path = os.path.join(os.path.dirname(__file__), "resources", "logo1.jpg")
-    page_icon = logo_path if os.path.exists(logo_path) else "📝"
+    page_icon = LOGO_PATH if os.path.exists(LOGO_PATH) else "📝"
     st.set_page_config(layout="wide", page_title="CoverByBushra", page_icon=page_icon)
     ensure_session_keys()
+    _restore_login_from_cookie()
+    _write_pending_auth_cookie()
     _render_top_nav()
     sidebar_auth_and_nav()
 
@@ -703,79 +876,67 @@ def create_streamlit_app(chain: Chain, rag: UserPortfolioRAG):
     _render_footer()
 
 
+LOGO_PATH = os.path.join(os.path.dirname(__file__), "static", "logo1.jpg")
+
+_TOP_NAV_CSS = """
+<style>
+.cbb-navbar {position: sticky; top: 0; z-index: 999; background: #0e1117; padding: 10px 16px; border-bottom: 1px solid #222;}
+.cbb-container {display: flex; align-items: center; justify-content: space-between;}
+.cbb-left {display: flex; align-items: center; gap: 10px;}
+.cbb-logo {width: 32px; height: 32px; border-radius: 6px; object-fit: cover; box-shadow: 0 0 0 1px #222, 0 2px 4px rgba(0,0,0,.4);}
+.cbb-logo-fallback {width:32px; height:32px; display:inline-flex; align-items:center; justify-content:center; font-size:20px; background:#1e2530; border-radius:6px; box-shadow: 0 0 0 1px #222;}
+.cbb-title {font-weight:700; color:#fff;}
+.cbb-links a {color:#ddd; margin-left:16px; text-decoration:none;}
+.cbb-links a:hover {color:#fff;}
+</style>
+"""
+
+_TOP_NAV_HTML = """
+<div class="cbb-navbar">
+    <div class="cbb-container">
+        <div class="cbb-left">
+            {logo}
+            <span class="cbb-title">CoverByBushra</span>
+        </div>
+        <div class="cbb-links">
+            <a href="https://github.com/Bushra-KB" target="_blank">🐱 GitHub</a>
+            <a href="#" title="Open Docs from the left menu">📄 Docs</a>
+            <a href="mailto:bushra.kmb@gmail.com" target="_blank">✉️ Contact Me</a>
+        </div>
+    </div>
+</div>
+"""
+
+
+@lru_cache(maxsize=1)
+def _logo_img_tag() -> str:
+    # Served by Streamlit's static file server (see .streamlit/config.toml): the page only
+    # carries the URL and the browser caches the image, instead of a base64 copy per rerun
+    if not os.path.exists(LOGO_PATH):
+        return '<span class="cbb-logo-fallback">📝</span>'
+    return '<img src="app/static/logo1.jpg" class="cbb-logo" alt="logo" />'
+
+
+@lru_cache(maxsize=1)
+def _top_nav_markup() -> str:
+    return _TOP_NAV_CSS + _TOP_NAV_HTML.format(logo=_logo_img_tag())
+
+
 def _render_top_nav():
-        # Navbar with embedded logo image.
-        logo_path = os.path.join(os.path.dirname(__file__), "resources", "logo1.jpg")
-        logo_b64 = None
-        if os.path.exists(logo_path):
-                try:
-                        with open(logo_path, "rb") as f:
-                                logo_b64 = base64.b64encode(f.read()).decode("utf-8")
-                except Exception:
-                        logo_b64 = None
-        img_tag = (
-                f'<img src="data:image/jpeg;base64,{logo_b64}" class="cbb-logo" alt="logo" />' if logo_b64 else '<span class="cbb-logo-fallback">📝</span>'
-        )
-        st.markdown(
-                f"""
-                <style>
-                .cbb-navbar {{position: sticky; top: 0; z-index: 999; background: #0e1117; padding: 10px 16px; border-bottom: 1px solid #222;}}
-                .cbb-container {{display: flex; align-items: center; justify-content: space-between;}}
-                .cbb-left {{display: flex; align-items: center; gap: 10px;}}
-                .cbb-logo {{width: 32px; height: 32px; border-radius: 6px; object-fit: cover; box-shadow: 0 0 0 1px #222, 0 2px 4px rgba(0,0,0,.4);}}
-                .cbb-logo-fallback {{width:32px; height:32px; display:inline-flex; align-items:center; justify-content:center; font-size:20px; background:#1e2530; border-radius:6px; box-shadow: 0 0 0 1px #222;}}
-                .cbb-title {{font-weight:700; color:#fff;}}
-                .cbb-links a {{color:#ddd; margin-left:16px; text-decoration:none;}}
-                .cbb-links a:hover {{color:#fff;}}
-                </style>
-                <div class="cbb-navbar">
-                    <div class="cbb-container">
-                        <div class="cbb-left">
-                            {img_tag}
-                            <span class="cbb-title">CoverByBushra</span>
-                        </div>
-                        <div class="cbb-links">
-                            <a href="https://github.com/Bushra-KB" target="_blank">🐱 GitHub</a>
-                            <a href="#" title="Open Docs from the left menu">📄 Docs</a>
-                            <a href="mailto:bushra.kmb@gmail.com" target="_blank">✉️ Contact Me</a>
-                        </div>
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-        )
+    # Navbar with embedded logo image.
+    st.markdown(_top_nav_markup(), unsafe_allow_html=True)
 
 
 def _render_footer():
-    from datetime import datetime
     year = datetime.now().year
     st.markdown("---")
     st.markdown(f"© {year} CoverByBushra · Developed by Bushra KB")
 
 
 def _inject_sidebar_nav_css():
-        st.sidebar.markdown(
-                """
-                <style>
-                /* Sidebar section header */
-                .cbb-side-section-header {display:flex; align-items:center; justify-content:space-between; padding:6px 4px 2px 4px;}
-                .cbb-side-title {font-weight:600; color:#ddd;}
-                .cbb-side-chevron {color:#aaa;}
-
-                /* Radio group styling to resemble clean nav list */
-                [data-testid="stSidebar"] div[role="radiogroup"] > label {
-                    display:flex; align-items:center; gap:10px; padding:8px 10px; border-radius:8px; margin:4px 0; border:1px solid transparent;
-                }
-                [data-testid="stSidebar"] div[role="radiogroup"] > label:hover {
-                    background:#1b1f2a; border-color:#2a3142;
-                }
-                [data-testid="stSidebar"] div[role="radiogroup"] > div label p {
-                    margin:0; padding:0; font-weight:500;
-                }
-                </style>
-                """,
-                unsafe_allow_html=True,
-        )
+    # Re-emitted every run: Streamlit drops elements a rerun doesn't output, so gating this on a
+    # session flag would unstyle the sidebar after the first interaction
+    st.sidebar.markdown(_SIDEBAR_NAV_CSS, unsafe_allow_html=True)
 
 
 def docs_tab():
@@ -804,6 +965,4 @@ def docs_tab():
 
 
 if __name__ == "__main__":
-    chain = Chain()
-    rag = UserPortfolioRAG()
-    create_streamlit_app(chain, rag)
+    create_streamlit_app(get_chain(), get_rag())
@@ -5,8 +5,19 @@ import streamlit as st
 from dotenv import load_dotenv
 from importlib import metadata as importlib_metadata
 
+# Optional component, imported once; None (with the reason kept for diagnostics) when unavailable
+try:
+    from streamlit_oauth import OAuth2Component
+    _OAUTH_IMPORT_ERROR: str | None = None
+except Exception as e:
+    OAuth2Component = None
+    _OAUTH_IMPORT_ERROR = str(e)
+
 load_dotenv()
 
+# Shared session so calls to Google's endpoints reuse pooled keep-alive connections
+_HTTP = requests.Session()
+
 
 def _get_env(name: str, default: str | None = None) -> str | None:
     val = os.getenv(name, default)
@@ -20,11 +31,7 @@ def has_google_oauth_config() -> bool:
 def can_render_google_button() -> bool:
     if not has_google_oauth_config():
         return False
-    try:
-        from streamlit_oauth import OAuth2Component  # noqa: F401
-        return True
-    except Exception:
-        return False
+    return OAuth2Component is not None
 
 
 def oauth_diagnostics() -> dict:
@@ -35,20 +42,37 @@ def oauth_diagnostics() -> dict:
     info["has_client_id"] = bool(client_id)
     info["has_client_secret"] = bool(client_secret)
     info["redirect_uri"] = _get_env("OAUTH_REDIRECT_URI", "http://localhost:8501")
-    try:
-        from streamlit_oauth import OAuth2Component  # noqa: F401
+    if OAuth2Component is not None:
         info["component_import"] = True
         try:
             version = importlib_metadata.version("streamlit-oauth")
         except Exception:
             version = None
         info["component_version"] = version
-    except Exception as e:
+    else:
         info["component_import"] = False
-        info["component_error"] = str(e)
+        info["component_error"] = _OAUTH_IMPORT_ERROR
     return info
 
 
+@st.cache_data(ttl=3500, show_spinner=False)
+def _fetch_google_userinfo(access_token: str) -> dict:
+    """Google's userinfo for an access token, memoized for about the token's lifetime (1h).
+
+    Streamlit reruns the script on every interaction while the OAuth result is still around;
+    this avoids repeating the HTTPS roundtrip with the same token. Non-200 responses raise
+    (exceptions aren't cached), so a transient error doesn't block the token for an hour.
+    """
+    resp = _HTTP.get(
+        "https://www.googleapis.com/oauth2/v3/userinfo",
+        headers={"Authorization": f"Bearer {access_token}"},
+        timeout=10,
+    )
+    if resp.status_code != 200:
+        raise requests.HTTPError(f"userinfo request failed with status {resp.status_code}", response=resp)
+    return resp.json()
+
+
 def google_login_button(label: str = "Continue with Google") -> dict | None:
     """Render a Google OAuth login button and return user info on success.
 
@@ -59,9 +83,7 @@ def google_login_button(label: str = "Continue with Google") -> dict | None:
     This implementation uses streamlit-oauth for the OAuth dance, then calls
     Google's userinfo endpoint to retrieve the user's email/name/picture.
     """
-    try:
-        from streamlit_oauth import OAuth2Component
-    except Exception:
+    if OAuth2Component is None:
         st.warning("OAuth component not available. Install streamlit-oauth and restart.")
         return None
 
@@ -118,14 +140,9 @@ def google_login_button(label: str = "Continue with Google") -> dict | None:
 
     # Fetch user info
     try:
-        resp = requests.get(
-            "https://www.googleapis.com/oauth2/v3/userinfo",
-            headers={"Authorization": f"Bearer {access_token}"},
-            timeout=10,
-        )
-        if resp.status_code != 200:
+        info = _fetch_google_userinfo(access_token)
+        if not info:
             return None
-        info = resp.json()
         # Normalize fields
         return {
             "email": info.get("email"),
@@ -1,38 +1,45 @@
-import pandas as pd
+import csv
 import chromadb
-import uuid
-from typing import List, Optional
+import os
+import hashlib
+import threading
+from typing import Any, Iterable, List, Optional
+from cachetools import LRUCache
+
+# Cached query_links results per RAG instance: (user_id, index version, skills, n_results) -> links
+QUERY_LINKS_CACHE_SIZE = 256
 
 
 class Portfolio:
     def __init__(self, file_path="app/resources/my_portfolio.csv"):
         self.file_path = file_path
-        self.data = pd.read_csv(file_path)
+        # Read once, sequentially; a plain list of row dicts is all load_portfolio needs
+        with open(file_path, newline="", encoding="utf-8") as f:
+            self.rows = list(csv.DictReader(f))
         self.chroma_client = chromadb.PersistentClient('vectorstore2')
         self.collection = self.chroma_client.get_or_create_collection(name="portfolio")
 
     def load_portfolio(self):
         if not self.collection.count():
-            for _, row in self.data.iterrows():
-                self.collection.add(documents=row["Techstack"],
-                                    metadatas={"links": row["Links"]},
-                                    ids=[str(uuid.uuid4())])
+            # One add() for all rows: a single embedding batch instead of one call per row
+            documents = [row["Techstack"] for row in self.rows]
+            if documents:
+                self.collection.add(documents=documents,
+                                    metadatas=[{"links": row["Links"]} for row in self.rows],
+                                    ids=[_gen_id() for _ in documents])
 
     def query_links(self, skills):
         if not skills:
             return []
-        result = self.collection.query(query_texts=skills, n_results=2)
-        metadatas = result.get('metadatas', []) or []
-        # Flatten and deduplicate links
-        links = []
-        seen = set()
-        for group in metadatas:
-            for md in group:
+        result = self.collection.query(query_texts=skills, n_results=2, include=["metadatas"])
+        # Flatten and deduplicate links; dict keys keep first-seen order
+        links = {}
+        for group in result.get('metadatas') or ():
+            for md in group or ():
                 link = (md or {}).get('links')
-                if link and link not in seen:
-                    seen.add(link)
-                    links.append(link)
-        return links
+                if link:
+                    links.setdefault(link, None)
+        return list(links)
 
 
 class UserPortfolioRAG:
@@ -45,26 +52,36 @@ class UserPortfolioRAG:
     def __init__(self, persist_dir: str = 'vectorstore2', collection_name: str = 'user_portfolio'):
         self.chroma_client = chromadb.PersistentClient(persist_dir)
         self.collection = self.chroma_client.get_or_create_collection(name=collection_name)
+        # Repeated skill sets skip the embedding + ANN query. Every write to a user's documents bumps
+        # their index version, so cached results never outlive the data they came from.
+        self._links_cache: LRUCache = LRUCache(maxsize=QUERY_LINKS_CACHE_SIZE)
+        self._index_versions: dict[str, int] = {}
+        self._cache_lock = threading.Lock()
+
+    def _bump_index_version(self, uid: str) -> None:
+        with self._cache_lock:
+            self._index_versions[uid] = self._index_versions.get(uid, 0) + 1
 
     def reindex_user(
         self,
         user_id: int | str,
-        profile: Optional[dict] = None,
-        portfolio_items: Optional[List[dict]] = None,
-        certifications: Optional[List[dict]] = None,
-        experiences: Optional[List[dict]] = None,
+        profile: Optional[Any] = None,
+        portfolio_items: Optional[Iterable[Any]] = None,
+        certifications: Optional[Iterable[Any]] = None,
+        experiences: Optional[Iterable[Any]] = None,
     ) -> None:
-        """Rebuild the user's index from provided data.
+        """Sync the user's index with the provided data.
 
-        We delete prior docs for this user and add fresh documents constructed from the provided records.
+        Documents have stable ids and carry a hash of their text, so only new or changed documents are
+        (re-)embedded, in one upsert() batch; documents for records no longer present are deleted.
+        Records are the ORM rows (Profile, PortfolioItem, ...) or any objects with the same attributes.
         """
         uid = str(user_id)
-        # Clear existing docs for the user to avoid duplicates
-        try:
-            self.collection.delete(where={"user_id": uid})
-        except Exception:
-            # If delete where is unsupported in some versions, ignore
-            pass
+        existing = self.collection.get(where={"user_id": uid}, include=["metadatas"])
+        indexed_hashes = {
+            doc_id: (md or {}).get("content_hash")
+            for doc_id, md in zip(existing.get("ids") or [], existing.get("metadatas") or [])
+        }
 
         documents = []
         metadatas = []
@@ -72,72 +89,139 @@ class UserPortfolioRAG:
 
         # Profile doc (skills + links help retrieval even if no URL)
         if profile:
-            skills = ", ".join(profile.get("skills", []) or [])
-            links = ", ".join(profile.get("links", []) or [])
-            bio = (profile.get("bio") or "").strip()
-            linkedin = profile.get("linkedin") or ""
-            github = profile.get("github") or ""
+            skills = ", ".join(getattr(profile, "skills", None) or ())
+            links = ", ".join(getattr(profile, "links", None) or ())
+            bio = (getattr(profile, "bio", None) or "").strip()
+            linkedin = getattr(profile, "linkedin", None) or ""
+            github = getattr(profile, "github", None) or ""
+            name = getattr(profile, "name", None) or ""
             text = (
-                f"Profile of {profile.get('name','')}. Education: {profile.get('education','')}. "
+                f"Profile of {name}. Education: {getattr(profile, 'education', None) or ''}. "
                 f"Skills: {skills}. Links: {links}. Bio: {bio}. LinkedIn: {linkedin}. GitHub: {github}."
             )
             documents.append(text)
-            metadatas.append({"user_id": uid, "type": "profile", "title": profile.get("name", "")})
-            ids.append(str(uuid.uuid4()))
-
-        # Portfolio items
-        for item in (portfolio_items or []):
-            skills = ", ".join(item.get("skills", []) or [])
-            desc = (item.get("description") or "").strip()
-            text = f"Portfolio: {item.get('title','')}. Skills: {skills}. {desc}"
-            documents.append(text)
-            metadatas.append({
-                "user_id": uid,
-                "type": "portfolio_item",
-                "title": item.get("title", ""),
-                "url": item.get("url"),
-            })
-            ids.append(f"pf-{item.get('id') or uuid.uuid4()}")
-
-        # Certifications
-        for cert in (certifications or []):
-            skills = ", ".join(cert.get("skills", []) or [])
-            text = f"Certification: {cert.get('title','')} by {cert.get('issuer','')}, date {cert.get('date','')}. Skills: {skills}."
-            documents.append(text)
-            metadatas.append({
-                "user_id": uid,
-                "type": "certification",
-                "title": cert.get("title", ""),
-            })
-            ids.append(f"ct-{cert.get('id') or uuid.uuid4()}")
-
-        # Experiences
-        for exp in (experiences or []):
-            skills = ", ".join(exp.get("skills", []) or [])
-            desc = (exp.get("description") or "").strip()
-            text = f"Experience: {exp.get('role','')} at {exp.get('organization','')} ({exp.get('years','')}). Skills: {skills}. {desc}"
-            documents.append(text)
-            metadatas.append({
-                "user_id": uid,
-                "type": "experience",
-                "title": exp.get("role", ""),
-            })
-            ids.append(f"xp-{exp.get('id') or uuid.uuid4()}")
+            metadatas.append({"user_id": uid, "type": "profile", "title": name, "content_hash": _content_hash(text, name)})
+            ids.append(f"profile-{uid}")
+
+        for kind, records in (
+            ("portfolio_item", portfolio_items),
+            ("certification", certifications),
+            ("experience", experiences),
+        ):
+            for record in (records or ()):
+                text, metadata = _item_document(uid, kind, record)
+                documents.append(text)
+                metadatas.append(metadata)
+                ids.append(_item_doc_id(kind, getattr(record, "id", None)))
+
+        current_ids = set(ids)
+        stale = [doc_id for doc_id in indexed_hashes if doc_id not in current_ids]
+        changed = [i for i, doc_id in enumerate(ids) if indexed_hashes.get(doc_id) != metadatas[i]["content_hash"]]
+        if stale:
+            self.collection.delete(ids=stale)
+        if changed:
+            self.collection.upsert(
+                documents=[documents[i] for i in changed],
+                metadatas=[metadatas[i] for i in changed],
+                ids=[ids[i] for i in changed],
+            )
+        if stale or changed:
+            self._bump_index_version(uid)
 
-        if documents:
-            self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
+    def upsert_item(self, user_id: int | str, kind: str, item: Any) -> None:
+        """Add or replace the document for a single portfolio item, certification or experience.
+
+        `kind` is one of "portfolio_item", "certification", "experience"; `item` is a record like
+        those passed to reindex_user. Only this item's document is re-embedded.
+        """
+        text, metadata = _item_document(str(user_id), kind, item)
+        self.collection.upsert(documents=[text], metadatas=[metadata], ids=[_item_doc_id(kind, item.id)])
+        self._bump_index_version(str(user_id))
+
+    def delete_item(self, user_id: int | str, kind: str, item_id: int) -> None:
+        """Remove a single item's document from the user's index."""
+        self.collection.delete(ids=[_item_doc_id(kind, item_id)], where={"user_id": str(user_id)})
+        self._bump_index_version(str(user_id))
+
+    def has_user_index(self, user_id: int | str) -> bool:
+        """True if the user already has documents in the collection."""
+        res = self.collection.get(where={"user_id": str(user_id)}, limit=1, include=[])
+        return bool(res.get("ids"))
 
     def query_links(self, user_id: int | str, skills: List[str], n_results: int = 3) -> List[str]:
         if not skills:
             return []
-        res = self.collection.query(query_texts=skills, n_results=n_results, where={"user_id": str(user_id)})
-        metadatas = res.get("metadatas", []) or []
-        links: List[str] = []
-        seen = set()
-        for group in metadatas:
-            for md in group:
+        uid = str(user_id)
+        with self._cache_lock:
+            key = (uid, self._index_versions.get(uid, 0), tuple(sorted(skills)), n_results)
+            cached = self._links_cache.get(key)
+        if cached is not None:
+            return list(cached)
+        links = self._query_links_uncached(uid, list(key[2]), n_results)
+        with self._cache_lock:
+            self._links_cache[key] = tuple(links)
+        return links
+
+    def _query_links_uncached(self, uid: str, skills: List[str], n_results: int) -> List[str]:
+        res = self.collection.query(
+            query_texts=skills, n_results=n_results, where={"user_id": uid}, include=["metadatas"]
+        )
+        # Only metadatas are requested, so Chroma doesn't ship documents/distances back
+        links: dict[str, None] = {}
+        for group in res.get("metadatas") or ():
+            for md in group or ():
                 url = (md or {}).get("url")
-                if url and url not in seen:
-                    seen.add(url)
-                    links.append(url)
-        return links
\ No newline at end of file
+                if url:
+                    links.setdefault(url, None)
+        return list(links)
+
+
+# Stable document id prefixes, so single items can be upserted/deleted in place
+_ID_PREFIXES = {"portfolio_item": "pf", "certification": "ct", "experience": "xp"}
+
+
+def _content_hash(text: str, *metadata_values: Any) -> str:
+    # Stored in metadata so reindex_user can tell which documents actually changed; covers the
+    # metadata values query_links returns too (e.g. a changed url with unchanged text)
+    parts = [text, *("" if v is None else str(v) for v in metadata_values)]
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _gen_id(prefix: str = "") -> str:
+    # Opaque random id for documents that are never addressed again; skips building a UUID object
+    return prefix + os.urandom(12).hex()
+
+
+def _item_doc_id(kind: str, item_id) -> str:
+    prefix = f"{_ID_PREFIXES[kind]}-"
+    return prefix + str(item_id) if item_id else _gen_id(prefix)
+
+
+def _item_document(uid: str, kind: str, item: Any) -> tuple[str, dict]:
+    """Build the (document text, metadata) pair indexed for one user record."""
+    # Each attribute is read once into a local and the text is a single f-string
+    skills = ", ".join(getattr(item, "skills", None) or ())
+    metadata = {"user_id": uid, "type": kind}
+    item_id = getattr(item, "id", None)
+    if item_id is not None:
+        metadata["item_id"] = item_id
+    if kind == "portfolio_item":
+        title = getattr(item, "title", None) or ""
+        description = (getattr(item, "description", None) or "").strip()
+        text = f"Portfolio: {title}. Skills: {skills}. {description}"
+        metadata.update(title=title, url=getattr(item, "url", None))
+    elif kind == "certification":
+        title = getattr(item, "title", None) or ""
+        issuer = getattr(item, "issuer", None) or ""
+        date = getattr(item, "date", None) or ""
+        text = f"Certification: {title} by {issuer}, date {date}. Skills: {skills}."
+        metadata["title"] = title
+    else:
+        role = getattr(item, "role", None) or ""
+        organization = getattr(item, "organization", None) or ""
+        years = getattr(item, "years", None) or ""
+        description = (getattr(item, "description", None) or "").strip()
+        text = f"Experience: {role} at {organization} ({years}). Skills: {skills}. {description}"
+        metadata["title"] = role
+    metadata["content_hash"] = _content_hash(text, metadata["title"], metadata.get("url"))
+    return text, metadata
\ No newline at end of file
@@ -1,33 +1,86 @@
-import io
 import re
+from functools import lru_cache
 from typing import List, Optional
 from urllib.parse import urlparse
 
+# Resume parsers are optional; imported once here and checked for None at use
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+try:
+    from docx import Document
+except ImportError:
+    Document = None
+
+# Patterns used on every scraped page / skills field, compiled once
+_HTML_TAG_RE = re.compile(r"<[^>]*?>")
+_URL_RE = re.compile(r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+")
+
 
 def clean_text(text: str) -> str:
     """Lightweight cleaner for scraped or pasted text.
 
-    - Strips HTML tags
+    - Strips HTML tags (and script/style contents on large pages)
     - Removes URLs
     - Normalizes whitespace and basic punctuation noise
     """
     if not isinstance(text, str):
         return ""
+    # Substring checks are much cheaper than a regex pass, so skip the passes that can't match
+    # (pasted plain-text descriptions usually have no tags and no links)
     # Remove HTML tags
-    text = re.sub(r"<[^>]*?>", "", text)
+    if "<" in text:
+        if len(text) > HTML_PARSE_MIN_CHARS:
+            text = _html_to_text(text)
+        else:
+            text = _HTML_TAG_RE.sub("", text)
     # Remove URLs
-    text = re.sub(r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+", "", text)
-    # Replace multiple spaces with a single space
-    text = re.sub(r"\s{2,}", " ", text)
-    # Trim leading and trailing whitespace
-    text = text.strip()
-    # Remove extra whitespace
-    text = " ".join(text.split())
-    return text
+    if "http" in text:
+        text = _URL_RE.sub("", text)
+    # Collapse all whitespace runs to single spaces and trim
+    return " ".join(text.split())
+
+
+# Above this size, HTML is stripped with lxml's parser instead of the tag regex
+HTML_PARSE_MIN_CHARS = 2048
+
+
+def _html_to_text(text: str) -> str:
+    """Text content of an HTML document/fragment, without <script>/<style> bodies.
+
+    Falls back to the tag regex if lxml is unavailable or can't parse the input.
+    """
+    try:
+        # Lazy import to avoid hard dependency when unused
+        from lxml import html as lxml_html
+
+        root = lxml_html.fromstring(text)
+        for el in list(root.iter("script", "style")):
+            el.drop_tree()
+        return " ".join(root.itertext())
+    except Exception:
+        return _HTML_TAG_RE.sub("", text)
+
+
+_URL_FAST_PREFIXES = ("http://", "https://")
 
 
 def validate_url(url: str) -> bool:
-    """Basic URL validator using urlparse; ensures scheme and netloc exist."""
+    """Basic URL validator; ensures an http(s) scheme and a non-empty netloc.
+
+    Plain ASCII lowercase http(s) URLs are checked with string operations only; anything unusual
+    (other casing, non-ASCII, tabs/newlines, brackets, non-str input) goes through urlparse, so the
+    result is the same as the urlparse check alone.
+    """
+    if (
+        isinstance(url, str)
+        and url.startswith(_URL_FAST_PREFIXES)
+        and url.isascii()
+        and not any(c in url for c in "\t\r\n[]")
+    ):
+        rest = url.partition("://")[2]
+        return bool(rest) and rest[0] not in "/?#"
     try:
         parsed = urlparse(url)
         return parsed.scheme in {"http", "https"} and bool(parsed.netloc)
@@ -39,17 +92,15 @@ def parse_skills(skills_text: str) -> List[str]:
     """Parse a comma/line-separated skills string into a clean list."""
     if not skills_text:
         return []
-    parts = re.split(r"[,\n]", skills_text)
-    skills = [p.strip() for p in parts if p.strip()]
-    # Deduplicate while preserving order
-    seen = set()
-    result = []
-    for s in skills:
-        key = s.lower()
-        if key not in seen:
-            seen.add(key)
-            result.append(s)
-    return result
+    # Two single-character delimiters: str.replace + split beats a regex split
+    parts = skills_text.replace("\n", ",").split(",")
+    # Deduplicate case-insensitively, keeping the first spelling and the original order
+    seen: dict[str, str] = {}
+    for part in parts:
+        part = part.strip()
+        if part:
+            seen.setdefault(part.lower(), part)
+    return list(seen.values())
 
 
 def coerce_skills(value) -> List[str]:
@@ -94,6 +145,35 @@ def safe_truncate(text: str, max_chars: int = 6000) -> str:
     return text[: cutoff if cutoff > 0 else max_chars].rstrip() + " …"
 
 
+@lru_cache(maxsize=1)
+def _token_encoding():
+    """cl100k_base encoder, or None if tiktoken (or its BPE file) is unavailable."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to at most max_tokens tokens.
+
+    Uses tiktoken's cl100k_base as a close proxy for the Groq-hosted models' tokenizers;
+    falls back to ~4 characters per token when tiktoken can't be loaded.
+    """
+    text = (text or "").strip()
+    if len(text) <= max_tokens:
+        return text  # every token is at least one character
+    enc = _token_encoding()
+    if enc is None:
+        return text[: max_tokens * 4]
+    tokens = enc.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return enc.decode(tokens[:max_tokens])
+
+
 def extract_text_from_upload(uploaded_file) -> Optional[str]:
     """Extract text from an uploaded resume file (PDF, DOCX, or TXT).
 
@@ -103,32 +183,27 @@ def extract_text_from_upload(uploaded_file) -> Optional[str]:
         return None
 
     filename = uploaded_file.name.lower()
-    content = uploaded_file.read()
 
+    # The parsers read the upload (a seekable file-like object) directly, without a bytes copy
     try:
-        if filename.endswith(".pdf"):
-            # Lazy import to avoid hard dependency when unused
-            from pypdf import PdfReader
-
-            with io.BytesIO(content) as f:
-                reader = PdfReader(f)
-                pages = [p.extract_text() or "" for p in reader.pages]
-                return "\n".join(pages)
+        if filename.endswith(".pdf") and PdfReader is not None:
+            uploaded_file.seek(0)
+            # Non-strict: tolerate minor spec violations instead of failing/validating every object
+            reader = PdfReader(uploaded_file, strict=False)
+            return "\n".join(p.extract_text() or "" for p in reader.pages)
 
-        if filename.endswith(".docx"):
+        if filename.endswith(".docx") and Document is not None:
             # Use python-docx to read text from a DOCX file-like object
-            from docx import Document
-
-            with io.BytesIO(content) as f:
-                doc = Document(f)
-                paragraphs = [p.text for p in doc.paragraphs]
-                return "\n".join(paragraphs)
+            uploaded_file.seek(0)
+            doc = Document(uploaded_file)
+            return "\n".join(p.text for p in doc.paragraphs)
     except Exception:
         # Fall through to TXT attempt
         pass
 
     try:
         # Assume UTF-8 text file
-        return content.decode("utf-8", errors="ignore")
+        uploaded_file.seek(0)
+        return uploaded_file.read().decode("utf-8", errors="ignore")
     except Exception:
         return None